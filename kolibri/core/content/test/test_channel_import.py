@@ -32,7 +32,10 @@ from kolibri.core.content.utils.annotation import (
     set_leaf_node_availability_from_local_file_availability,
 )
 from kolibri.core.content.utils.channel_import import ChannelImport
+from kolibri.core.content.utils.channel_import import FLUSH_INTERVAL
 from kolibri.core.content.utils.channel_import import import_channel_from_local_db
+from kolibri.core.content.utils.channel_import import INSERT_BATCH_SIZE
+from kolibri.core.content.utils.channel_import import NoVersionChannelImport
 from kolibri.core.content.utils.channels import read_channel_metadata_from_db_file
 from kolibri.core.content.utils.paths import get_content_database_file_path
 from kolibri.core.content.utils.sqlalchemybridge import get_default_db_string
@@ -232,7 +235,7 @@ class BaseChannelImportClassTableImportTestCase(TestCase):
         )
         channel_import.destination.session.flush.assert_not_called()
 
-    def test_no_merge_records_bulk_insert_flush(
+    def test_no_merge_records_bulk_insert_no_flush_at_batch_size(
         self, apps_mock, tree_id_mock, BridgeMock
     ):
         channel_import = ChannelImport("test")
@@ -240,9 +243,12 @@ class BaseChannelImportClassTableImportTestCase(TestCase):
         record_mock.__table__.columns.items.return_value = [("test_attr", MagicMock())]
         channel_import.destination.get_class.return_value = record_mock
         channel_import.table_import(
-            MagicMock(), lambda x, y: "test_val", lambda x: [{}] * 10000, 0
+            MagicMock(),
+            lambda x, y: "test_val",
+            lambda x: [{}] * INSERT_BATCH_SIZE,
+            0,
         )
-        channel_import.destination.session.flush.assert_called_once_with()
+        channel_import.destination.session.flush.assert_not_called()
 
     @patch("kolibri.core.content.utils.channel_import.merge_models", new=[])
     def test_merge_records_merge_no_flush(self, apps_mock, tree_id_mock, BridgeMock):
@@ -274,7 +280,7 @@ class BaseChannelImportClassTableImportTestCase(TestCase):
         merge_models.append(model_mock)
         channel_import.merge_record = Mock()
         channel_import.table_import(
-            model_mock, lambda x, y: "test_val", lambda x: [{}] * 10000, 0
+            model_mock, lambda x, y: "test_val", lambda x: [{}] * FLUSH_INTERVAL, 0
         )
         channel_import.destination.session.flush.assert_called_once_with()
 
@@ -323,7 +329,8 @@ class BaseChannelImportClassOtherMethodsTestCase(TestCase):
             [
                 call.session.query(class_mock.tree_id),
                 call.session.query().distinct(),
-                call.session.query().distinct().all(),
+                call.session.query().distinct().order_by(class_mock.tree_id),
+                call.session.query().distinct().order_by().all(),
             ]
         )
 
@@ -332,10 +339,43 @@ class BaseChannelImportClassOtherMethodsTestCase(TestCase):
         class_mock = Mock()
         [record for record in channel_import.base_table_mapper(class_mock)]
         channel_import.destination.assert_has_calls(
-            [call.session.query(class_mock), call.session.query().all()]
+            [call.session.query(class_mock), call.session.query().yield_per(10000)]
         )
 
 
+@patch("kolibri.core.content.utils.channel_import.Bridge")
+@patch("kolibri.core.content.utils.channel_import.ChannelImport.find_unique_tree_id")
+@patch("kolibri.core.content.utils.channel_import.apps")
+class NoVersionChannelImportLicenseTestCase(TestCase):
+    """
+    Testcase for the license lookups on unversioned imports
+    """
+
+    def test_missing_license_description_column(
+        self, apps_mock, tree_id_mock, BridgeMock
+    ):
+        # The license table of v0.2.0-beta1 databases only has id and license_name
+        # columns, so the prefetched license records cannot be assumed to carry a
+        # license_description
+        channel_import = NoVersionChannelImport("test")
+        license = Mock(spec=["id", "license_name"])
+        license.license_name = "CC BY"
+        channel_import.licenses = {1: license}
+        record = Mock(license_id=1)
+        self.assertEqual(channel_import.get_license_name(record), "CC BY")
+        self.assertIsNone(channel_import.get_license_description(record))
+
+    def test_license_cache_not_shared_across_imports(
+        self, apps_mock, tree_id_mock, BridgeMock
+    ):
+        # The license cache is per import instance - a v0.2.0-beta1 import running
+        # after another legacy import must only see its own source licenses
+        first = NoVersionChannelImport("test")
+        first.licenses = {1: Mock()}
+        second = NoVersionChannelImport("test")
+        self.assertIsNone(second.licenses)
+
+
 class MaliciousDatabaseTestCase(TestCase):
     @patch("kolibri.core.content.utils.channel_import.update_content_metadata")
     @patch("kolibri.core.content.utils.channel_import.initialize_import_manager")
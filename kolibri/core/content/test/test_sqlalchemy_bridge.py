@@ -137,7 +137,9 @@ class SQLAlchemyBridgeSQLAlchemyFunctionsTestCase(TestCase):
     )
     def test_make_session_sessionmaker(self, get_engine_mock, sessionmaker_mock):
         make_session("test")
-        sessionmaker_mock.assert_called_once_with(bind="test_engine", autoflush=False)
+        sessionmaker_mock.assert_called_once_with(
+            bind="test_engine", autoflush=False, expire_on_commit=False
+        )
 
     @patch(
         "kolibri.core.content.utils.sqlalchemybridge.sessionmaker",
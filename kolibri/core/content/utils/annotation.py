@@ -142,11 +142,12 @@ def set_leaf_node_availability_from_local_file_availability(channel_id):
 
     logger.info("Setting availability of File objects based on LocalFile availability")
 
-    connection.execute(
-        FileTable.update()
-        .values(available=file_statement)
-        .execution_options(autocommit=True)
-    )
+    # Run both update phases in a single transaction, so that we only pay one
+    # commit for the two UPDATE statements, and readers never observe File
+    # availability out of step with ContentNode availability.
+    trans = connection.begin()
+
+    connection.execute(FileTable.update().values(available=file_statement))
 
     contentnode_statement = (
         select([FileTable.c.contentnode_id])
@@ -172,9 +173,10 @@ def set_leaf_node_availability_from_local_file_availability(channel_id):
             )
         )
         .values(available=exists(contentnode_statement))
-        .execution_options(autocommit=True)
     )
 
+    trans.commit()
+
     bridge.end()
 
 
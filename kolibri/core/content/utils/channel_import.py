@@ -1,4 +1,6 @@
 import logging
+from itertools import islice
+from operator import attrgetter
 
 from django.apps import apps
 from django.db.models.fields.related import ForeignKey
@@ -25,6 +27,8 @@ from kolibri.core.content.models import V020BETA1
 from kolibri.core.content.models import V040BETA3
 from kolibri.core.content.models import VERSION_1
 from kolibri.core.content.models import VERSION_2
+from kolibri.core.sqlite.pragmas import IMPORT_DESTINATION_PRAGMAS
+from kolibri.core.sqlite.pragmas import IMPORT_SOURCE_PRAGMAS
 from kolibri.utils.time_utils import local_now
 
 logger = logging.getLogger(__name__)
@@ -39,6 +43,16 @@ models_to_exclude = [
     apps.get_model(CONTENT_APP_NAME, "ChannelMetadata_included_languages")
 ]
 
+# Number of rows to accumulate before handing a batch to the DBAPI executemany,
+# and the batch size used when streaming rows out of the source database
+INSERT_BATCH_SIZE = 10000
+
+# Number of rows sent through the ORM merge fallback between session flushes.
+# Flushing is decoupled from insert batching - the batched Core inserts hold no
+# pending state in the session, so only the merge path needs periodic flushing
+# to stop its identity map growing without bound.
+FLUSH_INTERVAL = 100000
+
 
 class ImportCancelError(Exception):
     pass
@@ -55,6 +69,17 @@ def column_not_auto_integer_pk(column):
     )
 
 
+def execute_pragmas(session, pragmas):
+    """
+    Execute a string of semicolon separated PRAGMA statements one at a time,
+    as the sqlite3 DBAPI only permits a single statement per execute call.
+    """
+    for pragma in pragmas.split(";"):
+        pragma = pragma.strip()
+        if pragma:
+            session.execute(text(pragma))
+
+
 def convert_to_sqlite_value(python_value):
     if isinstance(python_value, bool):
         return "1" if python_value else "0"
@@ -112,6 +137,14 @@ class ChannelImport(object):
 
         self.destination = Bridge(app_name=CONTENT_APP_NAME)
 
+        # Tune the connections held by the bridges for bulk import. The pragmas are
+        # connection scoped, and the bridges use a NullPool, so they last exactly as
+        # long as this import before the connections are discarded.
+        if self.destination.engine.name == "sqlite":
+            execute_pragmas(self.destination.session, IMPORT_DESTINATION_PRAGMAS)
+        # The source is always a local SQLite file, and is never written to
+        execute_pragmas(self.source.session, IMPORT_SOURCE_PRAGMAS)
+
         content_app = apps.get_app_config(CONTENT_APP_NAME)
 
         # Use this rather than get_models, as it returns a list of all models, including those
@@ -132,14 +165,15 @@ class ChannelImport(object):
 
     def get_all_destination_tree_ids(self):
         ContentNodeRecord = self.destination.get_class(ContentNode)
-        return sorted(
-            map(
-                lambda x: x[0],
-                self.destination.session.query(ContentNodeRecord.tree_id)
-                .distinct()
-                .all(),
-            )
-        )
+        # Sort in the database rather than in Python - the distinct tree_ids come
+        # back already ordered, so we just unpack the single column rows
+        return [
+            tree_id
+            for (tree_id,) in self.destination.session.query(ContentNodeRecord.tree_id)
+            .distinct()
+            .order_by(ContentNodeRecord.tree_id)
+            .all()
+        ]
 
     def find_unique_tree_id(self):
         tree_ids = self.get_all_destination_tree_ids()
@@ -151,28 +185,15 @@ class ChannelImport(object):
                 return 2
             return 1
 
-        # Do a binary search to find the lowest unused tree_id
-        def find_hole_in_list(ids):
-            last = len(ids) - 1
-            middle = int(last / 2 + 1)
-            # Check if the lower half of ids has a hole in it
-            if ids[middle] - ids[0] != middle:
-                # List is only two ids, so hole must be between them
-                if middle == 1:
-                    return ids[0] + 1
-                return find_hole_in_list(ids[:middle])
-            # Otherwise check if there is a hole in the second half
-            if ids[last] - ids[middle] != last - middle:
-                # Second half is only two ids so hole must be between them
-                if last - middle == 1:
-                    return ids[middle] + 1
-                return find_hole_in_list(ids[middle:])
-            # We should only reach this point in the first iteration, if there are no holes in either
-            # the first or the last half of the list, therefore, we just take the max of the list plus 1
-            # Because the list is already sorted, we can just take the last value
-            return ids[-1] + 1
-
-        return find_hole_in_list(tree_ids)
+        # Scan the sorted ids pairwise for the first gap, rather than recursing - for
+        # the number of tree_ids we realistically have, a single linear pass is cheaper
+        # than the function call overhead of a recursive search
+        for index in range(len(tree_ids) - 1):
+            if tree_ids[index + 1] - tree_ids[index] > 1:
+                return tree_ids[index] + 1
+        # If there are no holes, just take the maximum of the list plus 1
+        # Because the list is already sorted, we can just take the last value
+        return tree_ids[-1] + 1
 
     def generate_row_mapper(self, mappings=None):
         # If no mappings, just use an empty object
@@ -181,44 +202,287 @@ class ChannelImport(object):
             # the default return value without doing any other checks
             return self.base_row_mapper
 
+        resolved = {}
+
         def mapper(record, column):
             """
             A mapper function for the mappings object
             """
-            if column in mappings:
-                # If the column name is in our defined mappings object,
-                # then we need to try to find an alternate value
-                col_map = mappings.get(column)  # Get the string value for the mapping
-                if hasattr(record, col_map):
-                    # Is this mapping value another column of the table?
-                    # If so, return it straight away
-                    return getattr(record, col_map)
-                elif hasattr(self, col_map):
-                    # Otherwise, check to see if the import class has an attribute with this name
-                    # We assume that if it is, then it is either a literal value or a callable method
-                    # that accepts the row data as its only argument, and if so, return the result of
-                    # calling that method on the row data
-                    mapping = getattr(self, col_map)
-                    if callable(mapping):
-                        return mapping(record)
-                    else:
-                        return mapping
-                else:
-                    # If neither of these true, we specified a column mapping that is invalid
-                    raise AttributeError(
-                        "Column mapping specified but no valid column name or method found"
-                    )
-            else:
-                # Otherwise, we can just get the value directly from the record
-                return self.base_row_mapper(record, column)
+            # Resolve each column the first time it is seen, then reuse the
+            # resolved getter, so that repeated calls for the same column skip
+            # the mapping introspection and hasattr checks
+            try:
+                getter = resolved[column]
+            except KeyError:
+                getter = resolved[column] = self._resolve_column_getter(
+                    column, mappings, record
+                )
+            return getter(record)
+
+        # Tag the mapper with the mappings it was generated from, so that
+        # build_column_plan can resolve each column mapping once per table
+        # rather than once per cell
+        mapper.mappings = mappings
 
         # Return the mapper function for repeated use
         return mapper
 
+    def _resolve_column_getter(self, column, mappings, record):
+        """
+        Resolve how the value for a single destination column will be produced,
+        returning a single callable that accepts a source record and returns the
+        value for that column. This mirrors the per cell resolution order of the
+        mapper closure in generate_row_mapper.
+        The passed in record is a record of the source table, and is used to
+        resolve whether a mapping refers to a source column or to an attribute
+        of the import class.
+        """
+        if mappings and column in mappings:
+            col_map = mappings.get(column)  # Get the string value for the mapping
+            if hasattr(record, col_map):
+                # The mapping value is another column of the source table
+                return attrgetter(col_map)
+            if hasattr(self, col_map):
+                # The mapping value is an attribute of the import class - either
+                # a callable method that accepts the row data as its only argument,
+                # or a literal value
+                mapping = getattr(self, col_map)
+                if callable(mapping):
+                    return mapping
+
+                def constant_getter(record):
+                    return mapping
+
+                # Tag the getter with its value so that the batch insert path can
+                # fold the constant straight into its row template, rather than
+                # calling the getter once per row
+                constant_getter.constant_value = mapping
+
+                return constant_getter
+            # If neither of these true, we specified a column mapping that is invalid
+            raise AttributeError(
+                "Column mapping specified but no valid column name or method found"
+            )
+
+        def base_getter(record):
+            # No mapping for this column, so just read it directly off the record
+            return getattr(record, column, None)
+
+        return base_getter
+
+    def build_column_plan(self, columns, row_mapper, record):
+        """
+        Resolve, once per table, how each destination column value will be produced,
+        returning a list of (column name, getter) tuples, where each getter is a single
+        callable that accepts a source record and returns the value for that column.
+        This avoids repeatedly introspecting the mappings (and the hasattr checks that
+        that involves) for every cell in the hot import loop.
+        """
+        # If the row mapper is one we did not generate, we know nothing about it, so the
+        # best we can do is call it per cell - but still only once per cell.
+        mappings = getattr(row_mapper, "mappings", None)
+        if row_mapper != self.base_row_mapper and mappings is None:
+
+            def passthrough(column):
+                def getter(record):
+                    return row_mapper(record, column)
+
+                return getter
+
+            return [(str(column), passthrough(column)) for column in columns]
+
+        return [
+            (str(column), self._resolve_column_getter(column, mappings, record))
+            for column in columns
+        ]
+
+    def build_row_data(self, column_plan, record):
+        """
+        Build the data dict for a single source record, using the getters resolved
+        in the column plan. Columns whose value is None are omitted.
+        """
+        data = {}
+        for column_name, getter in column_plan:
+            value = getter(record)
+            if value is not None:
+                data[column_name] = value
+        return data
+
+    def build_column_defaults(self, dest_table):
+        """
+        Return a dict of the Python level defaults for each destination column
+        (set up on the SQLAlchemy table from the Django field defaults by the
+        Bridge). The DBAPI executemany requires every row to bind the same
+        parameters, so rows must be uniform across all columns, with defaults
+        filled in for any missing values.
+        The scalar vs callable distinction is resolved here, once per table,
+        storing a uniform context-accepting producer per defaulted column, so
+        the per cell None handling is a single lookup and call.
+        """
+        column_defaults = {}
+        for column_name, column_obj in dest_table.columns.items():
+            default = column_obj.default
+            if default is not None:
+                if default.is_callable:
+                    column_defaults[str(column_name)] = default.arg
+                else:
+
+                    def scalar_default(context, value=default.arg):
+                        return value
+
+                    column_defaults[str(column_name)] = scalar_default
+        return column_defaults
+
+    def build_insert_row_data(self, constant_data, dynamic_plan, column_defaults, record):
+        """
+        Build the data dict for a single source record for the insert path,
+        starting from the constant row template and substituting the column
+        default for any value the getters leave unset, so that every row binds
+        the same parameters in the executemany.
+        """
+        data = dict(constant_data)
+        for column_name, getter in dynamic_plan:
+            value = getter(record)
+            if value is None:
+                default = column_defaults.get(column_name)
+                if default is not None:
+                    value = default(None)
+            data[column_name] = value
+        return data
+
+    def generate_insert_rows(
+        self, columns, row_mapper, table_mapper, SourceRecord, column_defaults
+    ):
+        """
+        Generate the uniform row dicts for the insert path, one per source
+        record, resolving the column plan lazily from the first record.
+        """
+        # Hoist the attribute lookup that would otherwise be repeated per row
+        check_cancelled = self.check_cancelled
+        column_plan = None
+        constant_data = {}
+        dynamic_plan = []
+        for record in table_mapper(SourceRecord):
+            check_cancelled()
+            if column_plan is None:
+                # Resolve the per column getters once, using the first record,
+                # so that each row below costs a single call per cell with no
+                # mapping introspection
+                column_plan = self.build_column_plan(columns, row_mapper, record)
+                # Channel wide constants (values like the destination tree_id or
+                # the availability default) are folded into a row template that
+                # every row starts from, so their getters are never called in
+                # the per row loop
+                for column_name, getter in column_plan:
+                    constant = getattr(getter, "constant_value", None)
+                    if constant is not None:
+                        constant_data[column_name] = constant
+                    else:
+                        dynamic_plan.append((column_name, getter))
+            yield self.build_insert_row_data(
+                constant_data, dynamic_plan, column_defaults, record
+            )
+
+    def build_insert_statement(self, dest_table, columns, merge, do_not_overwrite):
+        """
+        Build the insert statement that will be reused for every batch of this
+        table. On SQLite, bypass SQLAlchemy statement execution for the hot
+        path entirely: render the INSERT once as a plain SQL string with named
+        parameters, so that each batch of row dicts can be handed straight to
+        the sqlite3 cursor's executemany, skipping per row bind parameter
+        processing. For merge models, the merge semantics are expressed
+        natively in the statement - INSERT OR IGNORE for models we must not
+        overwrite, and INSERT OR REPLACE otherwise - matching the behaviour of
+        the raw attached import for these models, which lets them share the
+        batched executemany path instead of issuing a SELECT plus an INSERT or
+        UPDATE per row through the ORM.
+        """
+        if self.destination.engine.name == "sqlite":
+            if merge:
+                method = (
+                    "INSERT OR IGNORE" if do_not_overwrite else "INSERT OR REPLACE"
+                )
+            else:
+                method = "INSERT"
+            column_names = [str(column) for column in columns]
+            # Quote the column identifiers, as some column names (such as
+            # ChannelMetadata's order) are SQLite keywords
+            return "{method} INTO {table} ({columns}) VALUES ({values})".format(
+                method=method,
+                table=dest_table.name,
+                columns=", ".join('"{}"'.format(name) for name in column_names),
+                values=", ".join(":" + name for name in column_names),
+            )
+        # Reuse a single Core insert construct for every batch of this table
+        return dest_table.insert()
+
+    def execute_insert_batches(self, insert_statement, rows):
+        """
+        Consume the row generator one bounded batch at a time, so that at most
+        INSERT_BATCH_SIZE built rows are ever held in memory, and each batch
+        list is released as soon as it has been executed.
+        """
+        session = self.destination.session
+        if self.destination.engine.name == "sqlite":
+            # Use the DBAPI connection underlying the session's own connection, so
+            # that the raw inserts join the surrounding import transaction and are
+            # covered by the final commit or rollback
+            cursor = session.connection().connection.cursor()
+            while True:
+                data_to_insert = list(islice(rows, INSERT_BATCH_SIZE))
+                if not data_to_insert:
+                    break
+                cursor.executemany(insert_statement, data_to_insert)
+            return
+        while True:
+            data_to_insert = list(islice(rows, INSERT_BATCH_SIZE))
+            if not data_to_insert:
+                break
+            session.execute(insert_statement, data_to_insert)
+
+    def orm_merge_table_import(
+        self,
+        model,
+        DestinationRecord,
+        SourceRecord,
+        columns,
+        row_mapper,
+        table_mapper,
+        do_not_overwrite,
+        unflushed_rows,
+    ):
+        """
+        Fallback import path for merge models on non-SQLite destinations, where
+        the merge semantics cannot be expressed in the insert statement itself:
+        merge each row through the ORM, flushing periodically.
+        """
+        column_plan = None
+        # Hoist attribute lookups that would otherwise be repeated for every row
+        check_cancelled = self.check_cancelled
+        session = self.destination.session
+        for record in table_mapper(SourceRecord):
+            check_cancelled()
+            if column_plan is None:
+                column_plan = self.build_column_plan(columns, row_mapper, record)
+            # The ORM merge path applies defaults itself, so omit any missing
+            # values here
+            data = self.build_row_data(column_plan, record)
+            self.merge_record(
+                data, model, DestinationRecord, do_not_overwrite=do_not_overwrite
+            )
+            unflushed_rows += 1
+            if unflushed_rows >= FLUSH_INTERVAL:
+                session.flush()
+                unflushed_rows = 0
+        return unflushed_rows
+
     def base_table_mapper(self, SourceRecord):
         # If SourceRecord is none, then the source table does not exist in the DB
         if SourceRecord:
-            return self.source.session.query(SourceRecord).all()
+            # Stream the results from the source database in batches, rather than
+            # materializing the entire table into memory up front, so that rows can
+            # start flowing into the destination while the source is still being read.
+            return self.source.session.query(SourceRecord).yield_per(INSERT_BATCH_SIZE)
         return []
 
     def base_row_mapper(self, record, column):
@@ -239,7 +503,14 @@ class ChannelImport(object):
     def raw_attached_sqlite_table_import(
         self, model, row_mapper, table_mapper, unflushed_rows
     ):
-
+        """
+        Fast path for SQLite destinations: the source database has been ATTACHed to
+        the destination connection (see try_attaching_sqlite_database), so the whole
+        table can be transferred with a single in-engine INSERT INTO ... SELECT
+        statement, without any rows ever passing through Python. Only usable when
+        the schema mapping for the model is expressible as column references and
+        literal constants - see can_use_sqlite_attach_method.
+        """
         self.check_cancelled()
 
         source_table = self.source.get_table(model)
@@ -332,35 +603,29 @@ class ChannelImport(object):
             for column_name, column_obj in dest_table.columns.items()
             if column_not_auto_integer_pk(column_obj)
         ]
-        data_to_insert = []
         merge = model in merge_models
         do_not_overwrite = model in models_not_to_overwrite
-        for record in table_mapper(SourceRecord):
-            self.check_cancelled()
-            data = {
-                str(column): row_mapper(record, column)
-                for column in columns
-                if row_mapper(record, column) is not None
-            }
-            if merge:
-                self.merge_record(
-                    data, model, DestinationRecord, do_not_overwrite=do_not_overwrite
-                )
-            else:
-                data_to_insert.append(data)
-            unflushed_rows += 1
-            if unflushed_rows == 10000:
-                if not merge:
-                    self.destination.session.bulk_insert_mappings(
-                        DestinationRecord, data_to_insert
-                    )
-                    data_to_insert = []
-                self.destination.session.flush()
-                unflushed_rows = 0
-        if not merge and data_to_insert:
-            self.destination.session.bulk_insert_mappings(
-                DestinationRecord, data_to_insert
+        if merge and self.destination.engine.name != "sqlite":
+            # On non-SQLite destinations the merge semantics cannot be expressed
+            # in the insert statement itself, so fall back to the per row ORM merge
+            return self.orm_merge_table_import(
+                model,
+                DestinationRecord,
+                SourceRecord,
+                columns,
+                row_mapper,
+                table_mapper,
+                do_not_overwrite,
+                unflushed_rows,
             )
+        insert_statement = self.build_insert_statement(
+            dest_table, columns, merge, do_not_overwrite
+        )
+        column_defaults = self.build_column_defaults(dest_table)
+        rows = self.generate_insert_rows(
+            columns, row_mapper, table_mapper, SourceRecord, column_defaults
+        )
+        self.execute_insert_batches(insert_statement, rows)
         return unflushed_rows
 
     def can_use_sqlite_attach_method(self, model, row_mapper, table_mapper):
@@ -563,12 +828,22 @@ class ChannelImport(object):
             self._sqlite_db_attached = False
 
     def import_channel_data(self):
-
+        """
+        Import the channel data, returning True if any data was imported, and False
+        if the destination already contains this channel at the same or a newer
+        version - in which case callers can skip their post import work as well.
+        """
         unflushed_rows = 0
+        import_ran = False
 
         try:
             self.try_attaching_sqlite_database()
             if self.check_and_delete_existing_channel():
+                # The per model imports are deliberately sequential: every table is
+                # written through the same session inside a single transaction, and
+                # on SQLite concurrent writers would serialize on the database lock
+                # anyway, so a worker pool here would add overhead without
+                # parallelism. The wins come from batching within each table.
                 for model in self.content_models:
                     mapping = self.schema_mapping.get(model, {})
                     row_mapper = self.generate_row_mapper(mapping.get("per_row"))
@@ -577,6 +852,7 @@ class ChannelImport(object):
                     unflushed_rows = self.table_import(
                         model, row_mapper, table_mapper, unflushed_rows
                     )
+                import_ran = True
             self.destination.session.commit()
             self.try_detaching_sqlite_database()
 
@@ -587,6 +863,8 @@ class ChannelImport(object):
             # Reraise the exception to prevent other errors occuring due to the non-completion
             raise e
 
+        return import_ran
+
     def end(self):
         self.source.end()
         self.destination.end()
@@ -648,21 +926,22 @@ class NoVersionChannelImport(ChannelImport):
         },
     }
 
-    licenses = {}
+    licenses = None
 
     def infer_channel_id_from_source(self, source_object):
         return self.channel_id
 
     def generate_local_file_from_file(self, SourceRecord):
         SourceRecord = self.source.get_class(File)
-        checksum_record = set()
-        # LocalFile objects are unique per checksum
-        for record in self.source.session.query(SourceRecord).all():
-            if record.checksum not in checksum_record:
-                checksum_record.add(record.checksum)
-                yield record
-            else:
-                continue
+        # LocalFile objects are unique per checksum, so deduplicate in the database
+        # with a GROUP BY, rather than accumulating a Python side set of every
+        # checksum seen. SQLite has no DISTINCT ON, but GROUP BY returns a single
+        # arbitrary row per checksum, which is all we need here.
+        return (
+            self.source.session.query(SourceRecord)
+            .group_by(SourceRecord.checksum)
+            .yield_per(INSERT_BATCH_SIZE)
+        )
 
     def set_version_to_no_version(self, source_object):
         return NO_VERSION
@@ -671,23 +950,31 @@ class NoVersionChannelImport(ChannelImport):
         license_id = SourceRecord.license_id
         if not license_id:
             return None
-        if license_id not in self.licenses:
+        if self.licenses is None:
+            # Load the entire license table in a single query the first time a
+            # license is looked up - legacy databases only contain a handful of
+            # licenses, so this replaces a lazy SELECT per distinct license id
             LicenseRecord = self.source.get_class(License)
-            license = self.source.session.query(LicenseRecord).get(license_id)
-            self.licenses[license_id] = license
-        return self.licenses[license_id]
+            self.licenses = dict(
+                (license.id, license)
+                for license in self.source.session.query(LicenseRecord).all()
+            )
+        return self.licenses.get(license_id)
 
     def get_license_name(self, SourceRecord):
         license = self.get_license(SourceRecord)
         if not license:
             return None
-        return license.license_name
+        return getattr(license, "license_name", None)
 
     def get_license_description(self, SourceRecord):
         license = self.get_license(SourceRecord)
         if not license:
             return None
-        return license.license_description
+        # The license table of very old source databases (v0.2.0-beta1) has no
+        # license_description column, so do not assume the reflected license
+        # records carry one
+        return getattr(license, "license_description", None)
 
 
 # Dict that maps from schema versions to ChannelImport classes
@@ -754,11 +1041,15 @@ def initialize_import_manager(channel_id, cancel_check=None):
 def import_channel_from_local_db(channel_id, cancel_check=None):
     import_manager = initialize_import_manager(channel_id, cancel_check=cancel_check)
 
-    import_manager.import_channel_data()
+    import_ran = import_manager.import_channel_data()
 
     import_manager.end()
 
-    update_content_metadata(channel_id)
+    # If the channel was already present at the same or a newer version, nothing
+    # was imported, so the metadata annotation pass would just recompute what is
+    # already in the database - skip it entirely.
+    if import_ran:
+        update_content_metadata(channel_id)
 
     channel = ChannelMetadata.objects.get(id=channel_id)
     channel.last_updated = local_now()
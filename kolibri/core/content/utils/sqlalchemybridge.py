@@ -73,9 +73,14 @@ def make_session(connection_string):
     from the engine, and will automatically start transactions for us.
     We use the autoflush option to the sessionmaker in order to have explicit control over
     when we actually commit to the database.
+    Setting expire_on_commit to False stops the session expiring every loaded object at
+    commit time - we throw the sessions away after use, so we never need the reload that
+    expiry would cause.
     """
     engine = get_engine(connection_string)
-    Session = scoped_session(sessionmaker(bind=engine, autoflush=False))
+    Session = scoped_session(
+        sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    )
     return Session(), engine
 
 
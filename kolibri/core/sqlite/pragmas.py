@@ -1,3 +1,15 @@
 CONNECTION_PRAGMAS = "PRAGMA wal_autocheckpoint=500;"
 
 START_PRAGMAS = "PRAGMA journal_mode=WAL;"
+
+# Pragmas to speed up bulk writes to the destination database during channel import.
+# These trade durability for write speed, so they are only ever applied to the
+# connection held for the duration of an import, and die with that connection.
+IMPORT_DESTINATION_PRAGMAS = (
+    "PRAGMA synchronous=OFF;PRAGMA temp_store=MEMORY;PRAGMA cache_size=-200000;"
+)
+
+# Pragmas for reading the source database during channel import - mark the
+# connection as read only, and allow SQLite to mmap up to 256MB of the file
+# rather than paging it all through its own cache.
+IMPORT_SOURCE_PRAGMAS = "PRAGMA query_only=1;PRAGMA mmap_size=268435456;"